@@ -5,80 +5,139 @@ Downloads Instagram post/reel thumbnails and updates recipes.csv
 """
 
 import argparse
+import atexit
 import csv
+import functools
+import io
+import itertools
 import json
 import logging
 import os
+import queue
 import re
 import shutil
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from urllib.parse import quote
 
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tqdm import tqdm
 from PIL import Image
+from selectolax.lexbor import LexborHTMLParser
 
 # Configuration
 DEFAULT_CSV = 'recipes.csv'
 DEFAULT_OUTPUT_DIR = 'images'
 DEFAULT_DELAY = 3.0
+DEFAULT_WORKERS = 8
 MAX_RETRIES = 3
 TIMEOUT = 10
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+JPEG_SOI = b'\xff\xd8\xff'
+JPEG_EOI = b'\xff\xd9'
+
+_IG_RE = re.compile(r'^https://www\.instagram\.com/(p|reel)/([^/?#]+)')
 
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
     'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
 ]
+_UA_CYCLE = itertools.cycle(USER_AGENTS)
 
 
 class ProgressTracker:
-    """Manages download progress and resume capability"""
+    """
+    Manages download progress and resume capability.
+
+    Updates are appended to an unbuffered binary log next to the progress file and
+    folded back into the JSON file once, at shutdown. Nothing is written
+    until something is marked.
+    """
 
     def __init__(self, progress_file: str = '.download_progress.json'):
         self.progress_file = progress_file
+        self.log_file = progress_file + '.log'
         self.data = self.load()
+        self._completed_set = set(self.data['completed_ids'])
+        self._append_fh = None  # Opened on the first mark_*
+        atexit.register(self.close)
 
     def load(self) -> Dict:
-        """Load progress from file"""
+        """Load progress from file, replaying any entries logged since the last save"""
+        data = {'completed_ids': [], 'failed_ids': {}}
         if os.path.exists(self.progress_file):
             try:
-                with open(self.progress_file, 'r') as f:
-                    return json.load(f)
+                with open(self.progress_file, 'rb') as f:
+                    data = orjson.loads(f.read())
             except:
                 pass
-        return {'completed_ids': [], 'failed_ids': {}}
+
+        if os.path.exists(self.log_file):
+            completed = set(data['completed_ids'])
+            with open(self.log_file, 'rb') as f:
+                for line in f:
+                    try:
+                        status, id, reason = orjson.loads(line)
+                    except ValueError:
+                        continue  # Partially written last line
+                    if status == 'completed':
+                        if id not in completed:
+                            completed.add(id)
+                            data['completed_ids'].append(id)
+                    else:
+                        data['failed_ids'][id] = reason
+        return data
 
     def save(self):
         """Save progress to file"""
-        with open(self.progress_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        with open(self.progress_file, 'wb') as f:
+            f.write(orjson.dumps(self.data, option=orjson.OPT_INDENT_2))
+
+    def close(self):
+        """Consolidate the append log into the progress file"""
+        if self._append_fh is None or self._append_fh.closed:
+            return
+        self._append_fh.close()
+        self.save()
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+
+    def _append(self, status: str, id: str, reason: str = ''):
+        if self._append_fh is None:
+            self._append_fh = open(self.log_file, 'ab', buffering=0)
+        self._append_fh.write(orjson.dumps([status, id, reason]) + b'\n')
 
     def mark_completed(self, id: str):
         """Mark ID as completed"""
-        if id not in self.data['completed_ids']:
+        if id not in self._completed_set:
+            self._completed_set.add(id)
             self.data['completed_ids'].append(id)
-        self.save()
+            self._append('completed', id)
 
     def mark_failed(self, id: str, reason: str):
         """Mark ID as failed"""
         self.data['failed_ids'][id] = reason
-        self.save()
+        self._append('failed', id, reason)
 
     def is_completed(self, id: str) -> bool:
         """Check if ID is completed"""
-        return id in self.data['completed_ids']
+        return id in self._completed_set
 
 
 class SkipChecker:
     """Determines if a row should be skipped"""
 
     @staticmethod
+    @functools.lru_cache(maxsize=4096)
     def should_skip(image_url: str) -> bool:
         """
         Check if row should be skipped based on image URL.
@@ -106,25 +165,47 @@ class SkipChecker:
         return False
 
 
+class RateLimiter:
+    """Enforces a minimum interval between requests, shared across worker threads"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot = 0.0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the caller's request slot comes up"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                slot = max(now, self._next_slot)
+                self._next_slot = slot + self.interval
+            if slot > now:
+                time.sleep(slot - now)
+            # A backoff() may have arrived while we slept; if so queue up again behind it
+            with self._lock:
+                if time.monotonic() >= self._blocked_until:
+                    return
+
+    def backoff(self, seconds: float):
+        """Hold back every caller, including those already waiting, for at least the given time (e.g. after HTTP 429)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._next_slot = max(self._next_slot, self._blocked_until)
+
+
 class InstagramScraper:
     """Fetches Instagram thumbnails using oEmbed API"""
 
     def __init__(self, delay: float = 3.0):
         self.delay = delay
         self.session = requests.Session()
-        self.last_request_time = 0
-
-    def _wait(self):
-        """Wait between requests to avoid rate limiting"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.delay:
-            time.sleep(self.delay - elapsed)
-        self.last_request_time = time.time()
+        self.limiter = RateLimiter(delay)
 
-    def _get_random_user_agent(self) -> str:
-        """Get random user agent"""
-        import random
-        return random.choice(USER_AGENTS)
+    def _next_user_agent(self) -> str:
+        """Get next user agent in rotation"""
+        return next(_UA_CYCLE)
 
     def parse_instagram_url(self, url: str) -> Optional[Tuple[str, str]]:
         """
@@ -132,51 +213,67 @@ class InstagramScraper:
 
         Returns: (type, id) where type is 'post' or 'reel'
         """
-        pattern = r'https://www\.instagram\.com/(p|reel)/([^/]+)'
-        match = re.search(pattern, url)
+        match = _IG_RE.match(url)
         if match:
             url_type = 'post' if match.group(1) == 'p' else 'reel'
             post_id = match.group(2)
             return (url_type, post_id)
         return None
 
+    def _retry_after(self, response: requests.Response) -> float:
+        """Seconds to wait according to Retry-After, defaulting to five delays"""
+        try:
+            return float(response.headers['Retry-After'])
+        except (KeyError, ValueError):
+            return self.delay * 5
+
     def fetch_thumbnail_url(self, instagram_url: str) -> Optional[str]:
         """
         Fetch thumbnail URL from Instagram using oEmbed API.
         Falls back to OG tag if oEmbed fails.
         """
-        self._wait()
+        self.limiter.acquire()
 
         try:
             # Try oEmbed API first (works for both posts and reels)
             oembed_url = f"https://www.instagram.com/api/v1/oembed/?url={quote(instagram_url)}"
-            logging.debug(f"Fetching oEmbed: {oembed_url}")
+            logging.debug("Fetching oEmbed: %s", oembed_url)
 
             response = self.session.get(oembed_url, timeout=TIMEOUT)
-            response.raise_for_status()
-            data = response.json()
 
-            thumbnail_url = data.get('thumbnail_url')
-            if thumbnail_url:
-                logging.debug(f"Got thumbnail from oEmbed: {thumbnail_url[:100]}...")
-                return thumbnail_url
+            # Rate limited: pause all Instagram requests instead of trying the fallback too
+            if response.status_code == 429:
+                retry_after = self._retry_after(response)
+                logging.warning(f"oEmbed rate limited, backing off {retry_after:.0f}s")
+                self.limiter.backoff(retry_after)
+                return None
+
+            # Error responses (404/410 for removed posts, etc.) go straight to the fallback
+            if response.status_code >= 400:
+                logging.warning(f"oEmbed returned HTTP {response.status_code}, trying OG tag fallback")
+            else:
+                data = orjson.loads(response.content)
+
+                thumbnail_url = data.get('thumbnail_url')
+                if thumbnail_url:
+                    logging.debug("Got thumbnail from oEmbed: %.100s...", thumbnail_url)
+                    return thumbnail_url
 
         except Exception as e:
             logging.warning(f"oEmbed failed: {e}, trying OG tag fallback")
 
         # Fallback: Try OG tag (works for posts when logged out)
         try:
-            self._wait()
-            headers = {'User-Agent': self._get_random_user_agent()}
+            self.limiter.acquire()
+            headers = {'User-Agent': self._next_user_agent()}
             response = self.session.get(instagram_url, headers=headers, timeout=TIMEOUT)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            og_image = soup.find('meta', property='og:image')
+            og_image = LexborHTMLParser(response.text).css_first('meta[property="og:image"]')
+            thumbnail_url = og_image.attributes.get('content') if og_image else None
 
-            if og_image and og_image.get('content'):
-                thumbnail_url = og_image['content']
-                logging.debug(f"Got thumbnail from OG tag: {thumbnail_url[:100]}...")
+            if thumbnail_url:
+                logging.debug("Got thumbnail from OG tag: %.100s...", thumbnail_url)
                 return thumbnail_url
 
         except Exception as e:
@@ -193,6 +290,19 @@ class ImageDownloader:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.skip_existing = skip_existing
 
+        # Persistent session so connections to the image CDN are reused
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(total=MAX_RETRIES, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        """Close the HTTP session"""
+        self.session.close()
+
     def download(self, url: str, filename: str) -> bool:
         """
         Download image from URL to local file.
@@ -203,12 +313,12 @@ class ImageDownloader:
 
         # Skip if exists
         if self.skip_existing and filepath.exists():
-            logging.debug(f"Skipping existing file: {filename}")
+            logging.debug("Skipping existing file: %s", filename)
             return True
 
         try:
-            logging.debug(f"Downloading: {url[:100]}...")
-            response = requests.get(url, stream=True, timeout=TIMEOUT)
+            logging.debug("Downloading: %.100s...", url)
+            response = self.session.get(url, stream=True, timeout=TIMEOUT)
             response.raise_for_status()
 
             # Check file size
@@ -217,30 +327,48 @@ class ImageDownloader:
                 logging.error(f"File too large: {content_length} bytes")
                 return False
 
-            # Download to temp file first
-            temp_filepath = filepath.with_suffix('.tmp')
-            with open(temp_filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            # Buffer in memory; thumbnails are small
+            data = bytearray()
+            for chunk in response.iter_content(chunk_size=65536):
+                data.extend(chunk)
+                if len(data) > MAX_FILE_SIZE:
+                    logging.error(f"File too large: over {MAX_FILE_SIZE} bytes")
+                    return False
 
-            # Verify image
-            if not self.verify_image(temp_filepath):
-                os.remove(temp_filepath)
+            if not self._verify_and_write(data, filepath):
                 return False
 
-            # Move to final location
-            shutil.move(str(temp_filepath), str(filepath))
-            logging.debug(f"Downloaded successfully: {filename}")
+            logging.debug("Downloaded successfully: %s", filename)
             return True
 
         except Exception as e:
             logging.error(f"Download failed: {e}")
             return False
 
-    def verify_image(self, filepath: Path) -> bool:
-        """Verify image is valid"""
+    def _verify_and_write(self, data: bytes, filepath: Path) -> bool:
+        """
+        Verify downloaded bytes and write them to disk.
+
+        Called from the download worker threads, so this CPU/disk step for one
+        image overlaps with the network waits of the others.
+        """
+        if not self.verify_image(data):
+            return False
+        filepath.write_bytes(data)
+        return True
+
+    def verify_image(self, data: bytes) -> bool:
+        """
+        Verify downloaded image bytes are valid.
+
+        Complete JPEGs (SOI marker at the start, EOI at the end) pass without
+        decoding; anything else goes through Pillow.
+        """
+        if data[:3] == JPEG_SOI and data[-2:] == JPEG_EOI:
+            return True
+
         try:
-            with Image.open(filepath) as img:
+            with Image.open(io.BytesIO(data)) as img:
                 img.verify()
             return True
         except Exception as e:
@@ -253,6 +381,8 @@ class CSVHandler:
 
     def __init__(self, csv_path: str):
         self.csv_path = Path(csv_path)
+        self.updates_path = self.csv_path.with_suffix('.updates.jsonl')
+        self._updates_fh = None
 
     def backup(self) -> str:
         """Create backup of CSV file"""
@@ -260,50 +390,126 @@ class CSVHandler:
         shutil.copy(str(self.csv_path), str(backup_path))
         return str(backup_path)
 
-    def read_rows(self) -> List[Dict]:
-        """Read CSV rows as dictionaries"""
-        rows = []
+    def iter_rows(self) -> Iterator[Dict]:
+        """Read CSV rows as dictionaries, one at a time"""
         with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for row in reader:
-                rows.append(row)
-        return rows
-
-    def write_rows(self, rows: List[Dict]):
-        """Write rows back to CSV with UTF-8 BOM"""
-        if not rows:
-            return
+            yield from csv.DictReader(f, delimiter=';')
+
+    def has_pending_updates(self) -> bool:
+        """Check for updates left behind by an interrupted run"""
+        return self.updates_path.exists()
+
+    def open_updates(self):
+        """Start recording row updates to the sidecar file"""
+        self._updates_fh = open(self.updates_path, 'a', encoding='utf-8', buffering=1)
+
+    def record_update(self, row_index: int, field: str, value: str):
+        """Persist a single field update immediately (row_index is 1-based)"""
+        if self._updates_fh is None:
+            self.open_updates()
+        self._updates_fh.write(json.dumps({'id': row_index, 'field': field, 'value': value}, ensure_ascii=False) + '\n')
+
+    def apply_updates(self, expected_rows: Optional[int] = None) -> int:
+        """
+        Merge recorded updates into the CSV, streaming rows through a temp file.
+
+        The temp file is re-read and its row count checked against expected_rows
+        (or the rows read from the source) before it replaces the CSV.
+
+        Returns: number of rows written
+        """
+        if self._updates_fh:
+            self._updates_fh.close()
+            self._updates_fh = None
+
+        updates = {}
+        if self.updates_path.exists():
+            with open(self.updates_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        update = json.loads(line)
+                    except ValueError:
+                        continue  # Partially written last line
+                    updates.setdefault(update['id'], {})[update['field']] = update['value']
 
         # Write to temp file first
         temp_path = self.csv_path.with_suffix('.tmp')
 
-        fieldnames = list(rows[0].keys())
-        with open(temp_path, 'w', encoding='utf-8-sig', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        count = 0
+        with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as src, \
+                open(temp_path, 'w', encoding='utf-8-sig', newline='') as dst:
+            reader = csv.DictReader(src, delimiter=';')
+            writer = csv.DictWriter(dst, fieldnames=reader.fieldnames, delimiter=';', quoting=csv.QUOTE_MINIMAL)
             writer.writeheader()
-            writer.writerows(rows)
+            for i, row in enumerate(reader, 1):
+                if i in updates:
+                    row.update(updates[i])
+                writer.writerow(row)
+                count = i
+
+        # Verify what actually landed on disk; the original stays untouched on mismatch.
+        # Plain csv.reader counts records (quoted newlines included) without
+        # building a dict per row; blank lines and the header are not records.
+        with open(temp_path, 'r', encoding='utf-8-sig', newline='') as f:
+            written = sum(1 for row in csv.reader(f, delimiter=';') if row) - 1
+        expected = count if expected_rows is None else expected_rows
+        if written != expected:
+            os.remove(temp_path)
+            raise ValueError(f"Row count mismatch! Original: {expected}, Written: {written}")
 
         # Atomic rename
         shutil.move(str(temp_path), str(self.csv_path))
+        if self.updates_path.exists():
+            os.remove(self.updates_path)
+        return written
 
-    def verify_integrity(self, original_count: int):
-        """Verify row count matches"""
-        rows = self.read_rows()
-        if len(rows) != original_count:
-            raise ValueError(f"Row count mismatch! Original: {original_count}, Current: {len(rows)}")
 
+def setup_logging(verbose: bool = False) -> QueueListener:
+    """
+    Setup logging configuration.
 
-def setup_logging(verbose: bool = False):
-    """Setup logging configuration"""
+    Worker threads only enqueue records; a background listener formats them
+    and writes to stdout and the log file. Returns the started listener.
+    """
     level = logging.DEBUG if verbose else logging.INFO
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('download.log')
-        ]
-    )
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler('download.log')
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def process_post(scraper: InstagramScraper, downloader: ImageDownloader,
+                 i: int, instagram_url: str, filename: str) -> Tuple[bool, str]:
+    """
+    Fetch thumbnail URL and download the image for a single post.
+    Runs in a worker thread; Instagram requests are still rate limited by the scraper.
+
+    Returns: (success, failure reason)
+    """
+    try:
+        thumbnail_url = scraper.fetch_thumbnail_url(instagram_url)
+        if not thumbnail_url:
+            raise Exception("Thumbnail URL not found")
+    except Exception as e:
+        logging.error(f"Row {i}: Failed to fetch thumbnail: {e}")
+        return False, str(e)
+
+    if not downloader.download(thumbnail_url, filename):
+        return False, "Download failed"
+    return True, ''
 
 
 def parse_row_range(row_spec: str) -> List[int]:
@@ -331,6 +537,7 @@ def main():
     parser.add_argument('--csv', default=DEFAULT_CSV, help='Path to CSV file')
     parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='Output directory for images')
     parser.add_argument('--delay', type=float, default=DEFAULT_DELAY, help='Delay between requests (seconds)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Number of concurrent downloads')
     parser.add_argument('--dry-run', action='store_true', help='Preview changes without downloading')
     parser.add_argument('--skip-existing', action='store_true', help='Skip already downloaded images')
     parser.add_argument('--resume', action='store_true', default=True, help='Resume from last progress')
@@ -348,6 +555,7 @@ def main():
     print(f"CSV: {args.csv}")
     print(f"Output: {args.output_dir}/")
     print(f"Delay: {args.delay}s between requests")
+    print(f"Workers: {args.workers}")
     print()
 
     # Initialize components
@@ -357,25 +565,41 @@ def main():
     progress = ProgressTracker() if args.resume else None
     skip_checker = SkipChecker()
 
-    # Read CSV
-    try:
-        rows = csv_handler.read_rows()
-        original_count = len(rows)
-        print(f"Loaded {original_count} rows from CSV")
-    except Exception as e:
-        print(f"Error reading CSV: {e}")
-        sys.exit(1)
+    # Backup CSV
+    if not args.no_backup and not args.dry_run:
+        backup_path = csv_handler.backup()
+        print(f"Creating backup: {backup_path} ✓")
+
+    # Apply updates recorded by an interrupted run
+    if not args.dry_run and csv_handler.has_pending_updates():
+        csv_handler.apply_updates()
+        print("Applied pending CSV updates from previous run ✓")
 
     # Parse row range if specified
-    row_indices = None
+    row_set = None
     if args.rows:
         row_indices = parse_row_range(args.rows)
+        row_set = frozenset(row_indices)
         print(f"Processing rows: {row_indices}")
 
-    # Backup CSV
-    if not args.no_backup and not args.dry_run:
-        backup_path = csv_handler.backup()
-        print(f"Creating backup: {backup_path} ✓")
+    # Read CSV, keeping only the fields needed for processing
+    original_count = 0
+    preview_rows = []
+    rows_to_process = []
+    try:
+        for i, row in enumerate(csv_handler.iter_rows(), 1):
+            original_count += 1
+            if args.dry_run:
+                if i <= 10:
+                    preview_rows.append(row)
+                continue
+            if row_set is not None and i not in row_set:
+                continue
+            rows_to_process.append((i, row.get('Link', '').strip(), row.get('Görsel URL', '').strip()))
+        print(f"Loaded {original_count} rows from CSV")
+    except Exception as e:
+        print(f"Error reading CSV: {e}")
+        sys.exit(1)
 
     # Load progress
     if progress:
@@ -390,7 +614,7 @@ def main():
     if args.dry_run:
         print("\n[DRY RUN] No files will be modified\n")
         print(f"Would process {original_count} rows:")
-        for i, row in enumerate(rows[:10], 1):  # Show first 10
+        for i, row in enumerate(preview_rows, 1):  # Show first 10
             instagram_url = row.get('Link', '').strip()
             if instagram_url:
                 parsed = scraper.parse_instagram_url(instagram_url)
@@ -408,21 +632,11 @@ def main():
     stats = {'total': 0, 'downloaded': 0, 'skipped': 0, 'failed': 0}
     failed_urls = []
 
-    # Filter rows
-    rows_to_process = []
-    for i, row in enumerate(rows, 1):
-        if row_indices and i not in row_indices:
-            continue
-        rows_to_process.append((i, row))
-
-    print()
-    for i, row in tqdm(rows_to_process, desc="Downloading"):
+    # Collect posts that need downloading: post_id -> (instagram_url, filename, row indices)
+    pending = {}
+    for i, instagram_url, current_image_url in rows_to_process:
         stats['total'] += 1
 
-        # Get URLs
-        instagram_url = row.get('Link', '').strip()
-        current_image_url = row.get('Görsel URL', '').strip()
-
         if not instagram_url:
             logging.warning(f"Row {i}: No Instagram URL")
             stats['skipped'] += 1
@@ -430,7 +644,7 @@ def main():
 
         # Check if should skip
         if skip_checker.should_skip(current_image_url):
-            logging.debug(f"Row {i}: Skipping (already has local image)")
+            logging.debug("Row %d: Skipping (already has local image)", i)
             stats['skipped'] += 1
             continue
 
@@ -446,45 +660,54 @@ def main():
 
         # Check progress
         if progress and progress.is_completed(post_id):
-            logging.debug(f"Row {i}: Already completed: {post_id}")
+            logging.debug("Row %d: Already completed: %s", i, post_id)
             stats['skipped'] += 1
             continue
 
-        # Fetch thumbnail URL
-        try:
-            thumbnail_url = scraper.fetch_thumbnail_url(instagram_url)
-            if not thumbnail_url:
-                raise Exception("Thumbnail URL not found")
-        except Exception as e:
-            logging.error(f"Row {i}: Failed to fetch thumbnail: {e}")
-            stats['failed'] += 1
-            failed_urls.append((instagram_url, str(e)))
-            if progress:
-                progress.mark_failed(post_id, str(e))
-            continue
-
-        # Download image
-        filename = f"{url_type}_{post_id}.jpg"
-        success = downloader.download(thumbnail_url, filename)
-
-        if success:
-            # Update CSV row
-            row['Görsel URL'] = f"{args.output_dir}/{filename}"
-            stats['downloaded'] += 1
-            if progress:
-                progress.mark_completed(post_id)
+        # Group rows by post so each post is fetched once
+        if post_id in pending:
+            pending[post_id][2].append(i)
         else:
-            stats['failed'] += 1
-            failed_urls.append((instagram_url, "Download failed"))
-            if progress:
-                progress.mark_failed(post_id, "Download failed")
+            pending[post_id] = (instagram_url, f"{url_type}_{post_id}.jpg", [i])
+
+    # Fetch and download concurrently; results are applied on the main thread
+    print()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(process_post, scraper, downloader, row_numbers[0], instagram_url, filename):
+                (post_id, instagram_url, filename, row_numbers)
+            for post_id, (instagram_url, filename, row_numbers) in pending.items()
+        }
+        try:
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Downloading"):
+                post_id, instagram_url, filename, row_numbers = futures[future]
+                success, reason = future.result()
+
+                if success:
+                    # Record CSV row updates
+                    for i in row_numbers:
+                        csv_handler.record_update(i, 'Görsel URL', f"{args.output_dir}/{filename}")
+                    stats['downloaded'] += len(row_numbers)
+                    if progress:
+                        progress.mark_completed(post_id)
+                else:
+                    stats['failed'] += len(row_numbers)
+                    failed_urls.extend((instagram_url, reason) for _ in row_numbers)
+                    if progress:
+                        progress.mark_failed(post_id, reason)
+        except KeyboardInterrupt:
+            # Drop the queued posts: nothing would record their results. Only
+            # the few in-flight ones finish; resume picks up the rest.
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    downloader.close()
 
     # Write updated CSV
     if stats['downloaded'] > 0:
         print("\nUpdating CSV...")
         try:
-            csv_handler.write_rows(rows)
-            csv_handler.verify_integrity(original_count)
+            csv_handler.apply_updates(original_count)
             print("CSV updated successfully! ✓")
         except Exception as e:
             print(f"Error writing CSV: {e}")
@@ -6,18 +6,22 @@ Fetches video metadata (title, description, thumbnail, publish date) from YouTub
 
 import argparse
 import csv
+import functools
 import json
 import logging
 import os
 import re
 import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
-from urllib.parse import parse_qs, urlparse
+from typing import Dict, Iterator, List, Optional
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 from tqdm import tqdm
 
@@ -26,9 +30,29 @@ load_dotenv()
 
 # Configuration
 DEFAULT_CSV = 'recipes.csv'
+DEFAULT_WORKERS = 10
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 YOUTUBE_API_ENDPOINT = 'https://www.googleapis.com/youtube/v3/videos'
 
+# Hosts are case-insensitive; the ID must be exactly 11 characters, not the
+# prefix of a longer malformed one
+_YT_RE = re.compile(
+    r'^https?://(?:(?:www\.)?youtube\.com/(?:watch\?(?:[^#]*&)?v=|embed/)|youtu\.be/)'
+    r'([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])',
+    re.IGNORECASE,
+)
+MAX_IDS_PER_REQUEST = 50  # videos.list limit
+
+
+@functools.lru_cache(maxsize=4096)
+def _extract_video_id(url: str) -> Optional[str]:
+    """Cached implementation of YouTubeFetcher.extract_video_id"""
+    if not url:
+        return None
+
+    match = _YT_RE.match(url)
+    return match.group(1) if match else None
+
 
 class YouTubeAPIError(Exception):
     """Custom exception for YouTube API errors"""
@@ -42,8 +66,23 @@ class YouTubeFetcher:
         if not api_key:
             raise ValueError("YouTube API key not found. Please set YOUTUBE_API_KEY in .env file")
         self.api_key = api_key
+        self.quota_exceeded = False
         self.session = requests.Session()
 
+        # All calls go to googleapis.com: keep connections alive and retry transient errors
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=5,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['GET']
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Accept-Encoding': 'gzip'})
+
     def extract_video_id(self, url: str) -> Optional[str]:
         """
         Extract video ID from YouTube URL.
@@ -53,26 +92,7 @@ class YouTubeFetcher:
         - https://youtu.be/VIDEO_ID
         - https://www.youtube.com/embed/VIDEO_ID
         """
-        if not url:
-            return None
-
-        # Parse URL
-        parsed = urlparse(url)
-
-        # Standard watch URL
-        if parsed.hostname in ['www.youtube.com', 'youtube.com']:
-            if parsed.path == '/watch':
-                query = parse_qs(parsed.query)
-                return query.get('v', [None])[0]
-            # Embed URL
-            elif parsed.path.startswith('/embed/'):
-                return parsed.path.split('/')[2]
-
-        # Short URL
-        elif parsed.hostname == 'youtu.be':
-            return parsed.path.lstrip('/')
-
-        return None
+        return _extract_video_id(url)
 
     def fetch_video_data(self, video_id: str) -> Optional[Dict]:
         """
@@ -84,54 +104,88 @@ class YouTubeFetcher:
         - thumbnail_url: High-quality thumbnail URL
         - published_at: ISO 8601 publish date
         """
+        return self._fetch_chunk([video_id]).get(video_id)
+
+    def fetch_video_data_batch(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch metadata for many videos, up to 50 IDs per API call.
+
+        Returns dict keyed by video ID, values shaped like fetch_video_data().
+        Videos that were not found or failed to fetch are left out.
+        """
+        results = {}
+        for start in range(0, len(video_ids), MAX_IDS_PER_REQUEST):
+            chunk = video_ids[start:start + MAX_IDS_PER_REQUEST]
+            results.update(self._fetch_chunk(chunk))
+        return results
+
+    def _fetch_chunk(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch metadata for at most 50 videos with a single API call"""
+        ids = ','.join(video_ids)
+        if self.quota_exceeded:
+            return {}
+
         try:
             params = {
                 'part': 'snippet',
-                'id': video_id,
+                'id': ids,
                 'key': self.api_key
             }
 
             response = self.session.get(YOUTUBE_API_ENDPOINT, params=params, timeout=10)
+
+            # Quota exhausted: every further call would fail the same way until the daily reset
+            if response.status_code == 403:
+                errors = orjson.loads(response.content).get('error', {}).get('errors', [])
+                if any(e.get('reason') in ('quotaExceeded', 'dailyLimitExceeded') for e in errors):
+                    self.quota_exceeded = True
+                    raise YouTubeAPIError("Quota exceeded, skipping remaining requests")
+
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
 
             # Check for API errors
             if 'error' in data:
                 error = data['error']
                 raise YouTubeAPIError(f"API Error: {error.get('message', 'Unknown error')}")
 
-            # Check if video exists
-            if not data.get('items'):
-                logging.warning(f"Video not found: {video_id}")
-                return None
+            results = {item['id']: self._parse_snippet(item['snippet']) for item in data.get('items', [])}
 
-            snippet = data['items'][0]['snippet']
+            # Check if videos exist
+            for video_id in video_ids:
+                if video_id not in results:
+                    logging.warning(f"Video not found: {video_id}")
 
-            # Get highest quality thumbnail
-            thumbnails = snippet['thumbnails']
-            thumbnail_url = (
-                thumbnails.get('maxres', {}).get('url') or
-                thumbnails.get('high', {}).get('url') or
-                thumbnails.get('medium', {}).get('url') or
-                thumbnails.get('default', {}).get('url')
-            )
-
-            return {
-                'title': snippet['title'],
-                'description': snippet['description'],
-                'thumbnail_url': thumbnail_url,
-                'published_at': snippet['publishedAt']
-            }
+            return results
 
         except requests.RequestException as e:
-            logging.error(f"Network error fetching video {video_id}: {e}")
-            return None
+            logging.error(f"Network error fetching videos {ids}: {e}")
+            return {}
         except YouTubeAPIError as e:
             logging.error(f"YouTube API error: {e}")
-            return None
+            return {}
         except Exception as e:
-            logging.error(f"Unexpected error fetching video {video_id}: {e}")
-            return None
+            logging.error(f"Unexpected error fetching videos {ids}: {e}")
+            return {}
+
+    @staticmethod
+    def _parse_snippet(snippet: Dict) -> Dict:
+        """Pick the fields we need from a video snippet"""
+        # Get highest quality thumbnail
+        thumbnails = snippet['thumbnails']
+        thumbnail_url = (
+            thumbnails.get('maxres', {}).get('url') or
+            thumbnails.get('high', {}).get('url') or
+            thumbnails.get('medium', {}).get('url') or
+            thumbnails.get('default', {}).get('url')
+        )
+
+        return {
+            'title': snippet['title'],
+            'description': snippet['description'],
+            'thumbnail_url': thumbnail_url,
+            'published_at': snippet['publishedAt']
+        }
 
 
 class CSVHandler:
@@ -139,6 +193,8 @@ class CSVHandler:
 
     def __init__(self, csv_path: str):
         self.csv_path = Path(csv_path)
+        self.updates_path = self.csv_path.with_suffix('.updates.jsonl')
+        self._updates_fh = None
 
     def backup(self) -> str:
         """Create backup of CSV file"""
@@ -146,37 +202,78 @@ class CSVHandler:
         shutil.copy(str(self.csv_path), str(backup_path))
         return str(backup_path)
 
-    def read_rows(self) -> List[Dict]:
-        """Read CSV rows as dictionaries"""
-        rows = []
+    def iter_rows(self) -> Iterator[Dict]:
+        """Read CSV rows as dictionaries, one at a time"""
         with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as f:
-            reader = csv.DictReader(f, delimiter=';')
-            for row in reader:
-                rows.append(row)
-        return rows
+            yield from csv.DictReader(f, delimiter=';')
+
+    def has_pending_updates(self) -> bool:
+        """Check for updates left behind by an interrupted run"""
+        return self.updates_path.exists()
+
+    def open_updates(self):
+        """Start recording row updates to the sidecar file"""
+        self._updates_fh = open(self.updates_path, 'a', encoding='utf-8', buffering=1)
+
+    def record_update(self, row_index: int, field: str, value: str):
+        """Persist a single field update immediately (row_index is 1-based)"""
+        if self._updates_fh is None:
+            self.open_updates()
+        self._updates_fh.write(json.dumps({'id': row_index, 'field': field, 'value': value}, ensure_ascii=False) + '\n')
 
-    def write_rows(self, rows: List[Dict]):
-        """Write rows back to CSV with UTF-8 BOM"""
-        if not rows:
-            return
+    def apply_updates(self, expected_rows: Optional[int] = None) -> int:
+        """
+        Merge recorded updates into the CSV, streaming rows through a temp file.
+
+        The temp file is re-read and its row count checked against expected_rows
+        (or the rows read from the source) before it replaces the CSV.
+
+        Returns: number of rows written
+        """
+        if self._updates_fh:
+            self._updates_fh.close()
+            self._updates_fh = None
+
+        updates = {}
+        if self.updates_path.exists():
+            with open(self.updates_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        update = json.loads(line)
+                    except ValueError:
+                        continue  # Partially written last line
+                    updates.setdefault(update['id'], {})[update['field']] = update['value']
 
         # Write to temp file first
         temp_path = self.csv_path.with_suffix('.tmp')
 
-        fieldnames = list(rows[0].keys())
-        with open(temp_path, 'w', encoding='utf-8-sig', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        count = 0
+        with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as src, \
+                open(temp_path, 'w', encoding='utf-8-sig', newline='') as dst:
+            reader = csv.DictReader(src, delimiter=';')
+            writer = csv.DictWriter(dst, fieldnames=reader.fieldnames, delimiter=';', quoting=csv.QUOTE_MINIMAL)
             writer.writeheader()
-            writer.writerows(rows)
+            for i, row in enumerate(reader, 1):
+                if i in updates:
+                    row.update(updates[i])
+                writer.writerow(row)
+                count = i
+
+        # Verify what actually landed on disk; the original stays untouched on mismatch.
+        # Plain csv.reader counts records (quoted newlines included) without
+        # building a dict per row; blank lines and the header are not records.
+        with open(temp_path, 'r', encoding='utf-8-sig', newline='') as f:
+            written = sum(1 for row in csv.reader(f, delimiter=';') if row) - 1
+        expected = count if expected_rows is None else expected_rows
+        if written != expected:
+            os.remove(temp_path)
+            raise ValueError(f"Row count mismatch! Original: {expected}, Written: {written}")
 
         # Atomic rename
         shutil.move(str(temp_path), str(self.csv_path))
-
-    def verify_integrity(self, original_count: int):
-        """Verify row count matches"""
-        rows = self.read_rows()
-        if len(rows) != original_count:
-            raise ValueError(f"Row count mismatch! Original: {original_count}, Current: {len(rows)}")
+        if self.updates_path.exists():
+            os.remove(self.updates_path)
+        return written
 
 
 def setup_logging(verbose: bool = False):
@@ -204,6 +301,7 @@ def format_date(iso_date: str) -> str:
 def main():
     parser = argparse.ArgumentParser(description='YouTube Video Data Fetcher')
     parser.add_argument('--csv', default=DEFAULT_CSV, help='Path to CSV file')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Number of concurrent API requests')
     parser.add_argument('--dry-run', action='store_true', help='Preview changes without updating')
     parser.add_argument('--verbose', action='store_true', help='Enable debug logging')
     parser.add_argument('--no-backup', action='store_true', help='Skip CSV backup')
@@ -229,24 +327,35 @@ def main():
     csv_handler = CSVHandler(args.csv)
     youtube = YouTubeFetcher(YOUTUBE_API_KEY)
 
-    # Read CSV
+    # Backup CSV (before merging pending updates, so the backup is the untouched file)
+    if not args.no_backup and not args.dry_run:
+        backup_path = csv_handler.backup()
+        print(f"Creating backup: {backup_path} ✓")
+
+    # Apply updates recorded by an interrupted run
+    if not args.dry_run and csv_handler.has_pending_updates():
+        csv_handler.apply_updates()
+        print("Applied pending CSV updates from previous run ✓")
+
+    # Read CSV, keeping only YouTube rows
+    original_count = 0
+    youtube_rows = []
     try:
-        rows = csv_handler.read_rows()
-        original_count = len(rows)
+        for i, row in enumerate(csv_handler.iter_rows(), 1):
+            original_count += 1
+            link = row.get('Link', '').strip()
+
+            # A parsable video ID is what makes a row a YouTube row; YouTube-looking
+            # links the regex can't parse (shorts, m.youtube.com) are still kept so
+            # they get reported as invalid instead of silently dropped
+            video_id = youtube.extract_video_id(link)
+            if video_id or 'youtu' in link or row.get('Platform', '').strip().lower() == 'youtube':
+                youtube_rows.append((i, row, link, video_id))
         print(f"Loaded {original_count} rows from CSV")
     except Exception as e:
         print(f"Error reading CSV: {e}")
         sys.exit(1)
 
-    # Find YouTube rows
-    youtube_rows = []
-    for i, row in enumerate(rows, 1):
-        platform = row.get('Platform', '').strip().lower()
-        link = row.get('Link', '').strip()
-
-        if platform == 'youtube' or 'youtube.com' in link or 'youtu.be' in link:
-            youtube_rows.append((i, row))
-
     print(f"Found {len(youtube_rows)} YouTube videos")
     print()
 
@@ -254,18 +363,10 @@ def main():
         print("No YouTube videos found in CSV")
         return
 
-    # Backup CSV
-    if not args.no_backup and not args.dry_run:
-        backup_path = csv_handler.backup()
-        print(f"Creating backup: {backup_path} ✓")
-        print()
-
     # Dry run preview
     if args.dry_run:
         print("[DRY RUN] No files will be modified\n")
-        for i, row in youtube_rows[:5]:
-            link = row.get('Link', '')
-            video_id = youtube.extract_video_id(link)
+        for i, row, link, video_id in youtube_rows[:5]:
             print(f"  {i}. {row.get('Başlık', 'Unknown')}")
             print(f"     Link: {link}")
             print(f"     Video ID: {video_id}")
@@ -280,13 +381,12 @@ def main():
     failed_videos = []
 
     print("Processing YouTube videos...\n")
-    for i, row in tqdm(youtube_rows, desc="Fetching"):
-        stats['total'] += 1
 
-        link = row.get('Link', '').strip()
+    # Pass 1: find rows missing data
+    to_fetch = []
+    for i, row, link, video_id in youtube_rows:
+        stats['total'] += 1
 
-        # Extract video ID
-        video_id = youtube.extract_video_id(link)
         if not video_id:
             logging.error(f"Row {i}: Invalid YouTube URL: {link}")
             stats['failed'] += 1
@@ -307,21 +407,33 @@ def main():
             stats['skipped'] += 1
             continue
 
-        # Fetch video data
-        video_data = youtube.fetch_video_data(video_id)
+        to_fetch.append((i, row, link, video_id, has_real_description, has_image, has_date))
+
+    # Pass 2: fetch video data, 50 IDs per API call, several calls in flight
+    video_ids = list(dict.fromkeys(item[3] for item in to_fetch))
+    chunks = [video_ids[start:start + MAX_IDS_PER_REQUEST] for start in range(0, len(video_ids), MAX_IDS_PER_REQUEST)]
+    video_data_by_id = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(youtube.fetch_video_data_batch, chunk) for chunk in chunks]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching"):
+            video_data_by_id.update(future.result())
+
+    # Pass 3: apply results to rows
+    for i, row, link, video_id, has_real_description, has_image, has_date in to_fetch:
+        video_data = video_data_by_id.get(video_id)
 
         if not video_data:
             stats['failed'] += 1
             failed_videos.append((link, "Failed to fetch data"))
             continue
 
-        # Update row
+        # Record row updates
         if not has_real_description:
-            row['Açıklama'] = video_data['description']
+            csv_handler.record_update(i, 'Açıklama', video_data['description'])
         if not has_image:
-            row['Görsel URL'] = video_data['thumbnail_url']
+            csv_handler.record_update(i, 'Görsel URL', video_data['thumbnail_url'])
         if not has_date:
-            row['Tarih'] = format_date(video_data['published_at'])
+            csv_handler.record_update(i, 'Tarih', format_date(video_data['published_at']))
 
         logging.info(f"Row {i}: Updated '{video_data['title']}'")
         stats['updated'] += 1
@@ -330,8 +442,7 @@ def main():
     if stats['updated'] > 0:
         print("\nUpdating CSV...")
         try:
-            csv_handler.write_rows(rows)
-            csv_handler.verify_integrity(original_count)
+            csv_handler.apply_updates(original_count)
             print("CSV updated successfully! ✓")
         except Exception as e:
             print(f"Error writing CSV: {e}")
@@ -6,18 +6,32 @@ CSV Başlık ve Hashtag Düzenleyici
 """
 
 import csv
+import os
 import re
 import shutil
+import sys
 from pathlib import Path
 
+PROGRESS_EVERY = 500
+
+_HASHTAG_RE = re.compile(r'#\w+')
+# Otomatik verilmiş 'Tarif123' gibi başlıklar
+_TARIF_RE = re.compile(r'Tarif\d+')
+# Hashtag'ler ve emoji/özel karakterler tek geçişte silinir
+_CLEAN_RE = re.compile(r'#\w+|[^\w\s\.,!?çÇğĞıİöÖşŞüÜ-]')
+# Başlık için tek geçişlik tarama: hashtag (atılır), cümle sonu, izinli metin.
+# Eşleşmeyen karakterler (emoji vb.) finditer tarafından atlanır.
+_TOKEN_RE = re.compile(r'#\w+|([.!?]+)|([\w\s,çÇğĞıİöÖşŞüÜ-]+)')
+
 
 def extract_hashtags(text):
     """Metinden hashtag'leri çıkar"""
-    if not text:
+    # '#' yoksa regex'e hiç girme
+    if not text or '#' not in text:
         return []
 
     # #kelime formatındaki hashtag'leri bul
-    hashtags = re.findall(r'#\w+', text)
+    hashtags = _HASHTAG_RE.findall(text)
     return hashtags
 
 
@@ -29,19 +43,23 @@ def generate_title_from_description(description):
     # Açıklamayı temizle
     text = description.strip()
 
-    # Hashtag'leri ve emoji'leri kaldır
-    text = re.sub(r'#\w+', '', text)
-    text = re.sub(r'[^\w\s\.,!?çÇğĞıİöÖşŞüÜ-]', '', text)
-
-    # İlk satırı al
-    first_line = text.split('\n')[0].strip()
-
-    # Çok uzunsa ilk cümleyi al
-    if len(first_line) > 50:
-        # İlk cümleyi bul (. ! ? ile biten)
-        sentences = re.split(r'[.!?]+', first_line)
-        if sentences:
-            first_line = sentences[0].strip()
+    # İlk satırı tek geçişte temizle (hashtag ve emoji'ler atlanır),
+    # ilk cümle sonunun yerini de aynı geçişte not et
+    parts = []
+    sentence_end = None
+    for match in _TOKEN_RE.finditer(text.split('\n', 1)[0]):
+        terminator, chunk = match.group(1, 2)
+        if terminator:
+            if sentence_end is None:
+                sentence_end = len(parts)
+            parts.append(terminator)
+        elif chunk:
+            parts.append(chunk)
+    first_line = ''.join(parts).strip()
+
+    # Çok uzunsa ilk cümleyi al (. ! ? ile biten)
+    if len(first_line) > 50 and sentence_end is not None:
+        first_line = ''.join(parts[:sentence_end]).strip()
 
     # Hala çok uzunsa ilk 50 karakteri al
     if len(first_line) > 50:
@@ -50,7 +68,7 @@ def generate_title_from_description(description):
     # Boşsa fallback
     if not first_line:
         # Focaccia, Tiramisu gibi kelimeler var mı?
-        words = text.split()
+        words = _CLEAN_RE.sub('', text).split()
         for word in words:
             if len(word) > 3 and word[0].isupper():
                 return word
@@ -63,66 +81,87 @@ def main():
     csv_path = Path('recipes.csv')
 
     # Backup oluştur
+    # Orijinal dosya yerinde değiştirilmez (os.replace ile yeni dosya gelir),
+    # bu yüzden hardlink kopyalamadan güvenli bir yedektir
     backup_path = csv_path.with_suffix('.csv.backup2')
-    shutil.copy(str(csv_path), str(backup_path))
+    backup_path.unlink(missing_ok=True)
+    try:
+        os.link(csv_path, backup_path)
+    except OSError:
+        shutil.copy2(csv_path, backup_path)
     print(f"✓ Backup oluşturuldu: {backup_path}")
 
-    # CSV'yi oku
-    rows = []
-    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
-        reader = csv.DictReader(f, delimiter=';')
-        fieldnames = reader.fieldnames
-
-        for row in reader:
-            rows.append(row)
-
-    print(f"✓ {len(rows)} satır okundu")
-
-    # Yeni sütun ekle: Hashtag
-    new_fieldnames = list(fieldnames)
-    if 'Hashtag' not in new_fieldnames:
-        # Tarih'ten sonra ekle
-        if 'Tarih' in new_fieldnames:
-            tarih_index = new_fieldnames.index('Tarih')
-            new_fieldnames.insert(tarih_index + 1, 'Hashtag')
-        else:
-            new_fieldnames.append('Hashtag')
-
-    # Her satırı işle
-    updated_count = 0
-    for i, row in enumerate(rows, 1):
-        açıklama = row.get('Açıklama', '')
-        mevcut_başlık = row.get('Başlık', '')
-
-        # 1. Hashtag'leri çıkar
-        hashtags = extract_hashtags(açıklama)
-        row['Hashtag'] = ' '.join(hashtags) if hashtags else ''
-
-        # 2. Başlığı güncelle (sadece "Tarif1", "Tarif2" gibi generic isimler için)
-        if mevcut_başlık.startswith('Tarif') and mevcut_başlık[5:].isdigit():
-            yeni_başlık = generate_title_from_description(açıklama)
-            row['Başlık'] = yeni_başlık
-            print(f"  {i}. '{mevcut_başlık}' → '{yeni_başlık}' | Hashtag: {row['Hashtag'][:50]}...")
-            updated_count += 1
-        else:
-            # Başlık zaten güzel, sadece hashtag ekle
-            if hashtags:
-                print(f"  {i}. '{mevcut_başlık}' (değişmedi) | Hashtag: {row['Hashtag'][:50]}...")
-
-    # CSV'yi yaz
+    # CSV'yi okurken işle ve geçici dosyaya yaz (tüm satırlar bellekte tutulmaz)
     temp_path = csv_path.with_suffix('.tmp')
-    with open(temp_path, 'w', encoding='utf-8-sig', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=new_fieldnames, delimiter=';', quoting=csv.QUOTE_MINIMAL)
-        writer.writeheader()
-        writer.writerows(rows)
+    stats = {'rows': 0, 'updated': 0}
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='', buffering=1024 * 1024) as src, \
+            open(temp_path, 'w', encoding='utf-8-sig', newline='', buffering=1024 * 1024) as dst:
+        reader = csv.reader(src, delimiter=';')
+        header = next(reader)
+
+        # Sütun indekslerini bir kez bul
+        idx_açıklama = header.index('Açıklama') if 'Açıklama' in header else None
+        idx_başlık = header.index('Başlık') if 'Başlık' in header else None
+
+        # Yeni sütun ekle: Hashtag
+        new_header = list(header)
+        if 'Hashtag' in new_header:
+            idx_hashtag = new_header.index('Hashtag')
+            insert_hashtag = False
+        else:
+            # Tarih'ten sonra ekle
+            if 'Tarih' in new_header:
+                idx_hashtag = new_header.index('Tarih') + 1
+            else:
+                idx_hashtag = len(new_header)
+            new_header.insert(idx_hashtag, 'Hashtag')
+            insert_hashtag = True
+
+        def transform(rows):
+            """Her satırı işle ve hemen yazılmak üzere ver"""
+            # Boş satırlar ([]) atlanır ve sayılmaz; DictReader da böyle yapıyordu
+            for i, row in enumerate(filter(None, rows), 1):
+                # Eksik alanları doldur
+                if len(row) < len(header):
+                    row.extend([''] * (len(header) - len(row)))
+
+                açıklama = row[idx_açıklama] if idx_açıklama is not None else ''
+                mevcut_başlık = row[idx_başlık] if idx_başlık is not None else ''
+
+                # 1. Hashtag'leri çıkar
+                hashtags = extract_hashtags(açıklama)
+                hashtag_text = ' '.join(hashtags) if hashtags else ''
+                if insert_hashtag:
+                    row.insert(idx_hashtag, hashtag_text)
+                else:
+                    row[idx_hashtag] = hashtag_text
+
+                # 2. Başlığı güncelle (sadece "Tarif1", "Tarif2" gibi generic isimler için)
+                if mevcut_başlık and _TARIF_RE.fullmatch(mevcut_başlık):
+                    yeni_başlık = generate_title_from_description(açıklama)
+                    row[idx_başlık] = yeni_başlık
+                    stats['updated'] += 1
+
+                stats['rows'] = i
+
+                # Her satır için yazdırmak yerine ara ara ilerleme göster
+                if i % PROGRESS_EVERY == 0:
+                    sys.stdout.write(f"  {i} satır işlendi ({stats['updated']} başlık güncellendi)\n")
+                    sys.stdout.flush()
+
+                yield row
+
+        writer = csv.writer(dst, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(new_header)
+        writer.writerows(transform(reader))
 
     # Atomik rename
-    shutil.move(str(temp_path), str(csv_path))
+    os.replace(temp_path, csv_path)
 
     print(f"\n✓ CSV güncellendi!")
-    print(f"  - {updated_count} başlık güncellendi")
+    print(f"  - {stats['updated']} başlık güncellendi")
     print(f"  - Hashtag sütunu eklendi")
-    print(f"  - Toplam satır: {len(rows)}")
+    print(f"  - Toplam satır: {stats['rows']}")
 
 
 if __name__ == '__main__':